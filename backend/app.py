@@ -1,12 +1,20 @@
+# Threading, oneDNN and core placement must be configured before TensorFlow is imported
+from runtime_config import apply_runtime_config
+runtime_config = apply_runtime_config()
+
 from flask import Flask, render_template
 from flask_cors import CORS
-import tensorflow as tf
+from flask_sock import Sock
 from models import WASTE_CATEGORIES
-from utils import load_model_safely
-from routes import home, get_categories, predict, test, health_check
+from utils import load_model_safely, load_model_shared
+from routes import home, get_categories, predict, stream, get_stats, test, health_check, MAX_FRAME_SIZE
+from prediction_log import prediction_log
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='/static', template_folder='../frontend')
 CORS(app)
+# Have the WebSocket server reject oversized frames instead of buffering them whole
+app.config['SOCK_SERVER_OPTIONS'] = {'max_message_size': MAX_FRAME_SIZE}
+sock = Sock(app)
 
 print("=" * 60)
 print("SmartBin ")
@@ -14,22 +22,29 @@ print("=" * 60)
 
 print(f"Defined {len(WASTE_CATEGORIES)} waste categories")
 
-# Check TensorFlow version
-print(f"TensorFlow Version: {tf.__version__}")
-
-# Load the model
-model = load_model_safely()
+# Load the model. Shared mode runs on a standalone TFLite runtime and never imports TensorFlow
+if runtime_config['model_mode'] == 'shared':
+    model = load_model_shared(num_threads=runtime_config['intra_op_threads'])
+else:
+    import tensorflow as tf
+    print(f"TensorFlow Version: {tf.__version__}")
+    model = load_model_safely()
 
 # Set model in utils for routes to use
 import utils
 utils.model = model
 
+# Rebuild stats rollups from the prediction log and start its background writer
+prediction_log.start()
+
 # Register routes
 app.add_url_rule('/', 'home', home, methods=['GET'])
 app.add_url_rule('/api/categories', 'get_categories', get_categories, methods=['GET'])
 app.add_url_rule('/predict', 'predict', predict, methods=['POST'])
+sock.route('/stream')(stream)
 app.add_url_rule('/test', 'test', test, methods=['GET'])
 app.add_url_rule('/api/health', 'health_check', health_check, methods=['GET'])
+app.add_url_rule('/api/stats', 'get_stats', get_stats, methods=['GET'])
 
 if __name__ == '__main__':
     print("\n" + "=" * 60)
@@ -38,8 +53,10 @@ if __name__ == '__main__':
     print(f"Waste categories: {len(WASTE_CATEGORIES)}")
     print("Server URL: http://localhost:5000")
     print("API Test: http://localhost:5000/test")
+    print("Camera Stream: ws://localhost:5000/stream")
     print("Categories API: http://localhost:5000/api/categories")
     print("Health Check: http://localhost:5000/api/health")
+    print("Stats API: http://localhost:5000/api/stats")
     print("=" * 60)
 
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,49 @@
+"""Export the Keras model to the TFLite serving artifact used in shared mode.
+
+Run this once after fix_model.py, and again whenever smartbin_fixed.h5
+changes. Workers started with SMARTBIN_MODEL_MODE=shared then memory-map the
+exported file directly and never load the Keras model themselves.
+
+The export is checked by running the same random batch through the Keras
+model and the exported file and comparing the outputs.
+
+Usage:
+    python export_model.py [--output smartbin_fixed.tflite] [--tolerance 1e-4]
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from utils import SERVING_MODEL_PATH, SharedWeightsModel, export_serving_model, load_model_safely
+
+def verify_export(keras_model, serving_path, tolerance):
+    """Compare the exported model's output with the Keras model on a random batch"""
+    batch = np.random.rand(2, 224, 224, 3).astype(np.float32)
+    expected = keras_model.predict(batch, verbose=0)
+    actual = SharedWeightsModel(serving_path).predict(batch)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > tolerance:
+        print(f"✗ Exported model differs from Keras model (max abs diff {max_diff:.2e} > {tolerance:.0e})")
+        return False
+    print(f"✓ Exported model matches Keras model (max abs diff {max_diff:.2e})")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the serving model for shared-weights mode')
+    parser.add_argument('--output', default=SERVING_MODEL_PATH,
+                        help=f'path of the exported model (default: {SERVING_MODEL_PATH})')
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help='largest output difference accepted when verifying (default: 1e-4)')
+    args = parser.parse_args()
+
+    model = load_model_safely()
+    if model is None:
+        sys.exit("Could not load the Keras model; run fix_model.py first")
+    if not export_serving_model(model, args.output):
+        sys.exit(1)
+    if not verify_export(model, args.output, args.tolerance):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""Open-loop HTTP load generator for the SmartBin server.
+
+Requests are sent on a fixed schedule (rate R means request i is due at
+i / R seconds) regardless of how quickly earlier ones complete. Latency is
+measured from each request's scheduled time, not from when it was actually
+sent, so queueing delay is counted even when the client falls behind
+(coordinated-omission correction).
+
+The rate is ramped step by step; each step reports throughput over the
+arrival window, the time to drain the remaining responses, error rate,
+latency percentiles and a histogram. The ramp stops at the first step that
+misses the SLO, builds up a backlog (late requests wait clearly longer than
+early ones), or cannot keep up with the offered rate.
+
+Only loopback targets are allowed, so the tool never generates load over
+the network.
+
+Usage:
+    python loadtest.py --images ./samples --rates 2,5,10,20,40 --duration 20 --slo-ms 500
+"""
+import argparse
+import concurrent.futures
+import http.client
+import io
+import ipaddress
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+
+# Latency growth within a step below this is treated as noise, not a backlog
+MIN_BACKLOG_GROWTH_MS = 20
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BOUNDS = [5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf')]
+
+def parse_float_list(value):
+    return [float(v) for v in value.split(',') if v.strip()]
+
+def ensure_local(host):
+    """Refuse to generate load against anything other than this machine"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror as e:
+        sys.exit(f"Cannot resolve {host}: {e}")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_loopback:
+            sys.exit(f"Refusing to load-test non-local host {host} ({address})")
+
+def load_corpus(image_dir, synthetic_count):
+    """Return a list of (filename, bytes) to replay, generating images if no directory is given"""
+    corpus = []
+    if image_dir:
+        for name in sorted(os.listdir(image_dir)):
+            if '.' in name and name.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS:
+                with open(os.path.join(image_dir, name), 'rb') as f:
+                    corpus.append((name, f.read()))
+        if not corpus:
+            sys.exit(f"No images found in {image_dir}")
+        return corpus
+
+    from PIL import Image
+    size = (1280, 720)
+    for i in range(synthetic_count):
+        # Noise over a tinted gradient, so upload size and decode cost resemble camera frames
+        noise = Image.merge('RGB', [Image.effect_noise(size, random.uniform(20, 50)) for _ in range(3)])
+        gradient = Image.linear_gradient('L').rotate(random.choice([0, 90, 180, 270])).resize(size)
+        tint = Image.new('RGB', size, tuple(random.randrange(256) for _ in range(3)))
+        background = Image.composite(tint, Image.new('RGB', size, (0, 0, 0)), gradient)
+        image = Image.blend(background, noise, 0.3)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        corpus.append((f"synthetic_{i}.jpg", buffer.getvalue()))
+    return corpus
+
+def encode_multipart(filename, data):
+    """Build a multipart/form-data body with a single 'file' field"""
+    boundary = uuid.uuid4().hex
+    content_type = 'image/png' if filename.lower().endswith('.png') else 'image/jpeg'
+    body = (
+        f"--{boundary}\r\n"
+        f"Content-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode('utf-8') + data + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class Target:
+    def __init__(self, url, timeout):
+        parsed = urlparse(url)
+        if parsed.scheme != 'http':
+            sys.exit(f"Unsupported URL scheme '{parsed.scheme}': only plain http:// to a local server is supported")
+        if not parsed.hostname:
+            sys.exit(f"No host in URL {url}")
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path or '/predict'
+        self.timeout = timeout
+
+    def send(self, body, content_type):
+        """POST one request; returns the HTTP status (raises on connection errors)"""
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.request('POST', self.path, body=body, headers={'Content-Type': content_type})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+def run_step(target, requests_pool, rate, duration, max_in_flight):
+    """Offer `rate` requests/second for `duration` seconds; return the step's measurements.
+
+    Throughput is measured over the arrival window, not until the last
+    response drains, so a long but steady service time is not mistaken for
+    falling behind. The window is shifted by the unloaded latency (median of
+    the first quarter of requests), the delay after which completions
+    should track arrivals.
+    """
+    total = max(1, int(rate * duration))
+    window = total / rate
+    # Per request, in schedule order: (latency_ms, completed_at, ok)
+    outcomes = [None] * total
+    errors = []
+    lock = threading.Lock()
+
+    def fire(index, scheduled, body, content_type):
+        try:
+            status = target.send(body, content_type)
+            ok = 200 <= status < 300
+            error = None if ok else f"HTTP {status}"
+        except Exception as e:
+            ok, error = False, type(e).__name__
+        completed_at = time.perf_counter()
+        # Measured from the scheduled send time, so client-side queueing counts too
+        latency_ms = (completed_at - scheduled) * 1000
+        with lock:
+            outcomes[index] = (latency_ms, completed_at, ok)
+            if not ok:
+                errors.append(error)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            body, content_type = requests_pool[i % len(requests_pool)]
+            executor.submit(fire, i, scheduled, body, content_type)
+    window_end = start + window
+
+    quarter = max(1, total // 4)
+    first_quarter = sorted(outcome[0] for outcome in outcomes[:quarter])
+    last_quarter = sorted(outcome[0] for outcome in outcomes[-quarter:])
+    baseline_ms = percentile(first_quarter, 0.50)
+
+    completed_in_window = sum(1 for latency_ms, completed_at, ok in outcomes
+                              if ok and completed_at <= window_end + baseline_ms / 1000)
+
+    latencies = sorted(outcome[0] for outcome in outcomes)
+    histogram = [0] * len(HISTOGRAM_BOUNDS)
+    for latency in latencies:
+        for i, bound in enumerate(HISTOGRAM_BOUNDS):
+            if latency <= bound:
+                histogram[i] += 1
+                break
+
+    return {
+        'offered_rate': rate,
+        'requests': total,
+        'throughput': completed_in_window / window,
+        'drain_s': max(0.0, max(outcome[1] for outcome in outcomes) - window_end),
+        # How much slower the end of the step was than its start: grows with a backlog
+        'first_quarter_p50_ms': baseline_ms,
+        'last_quarter_p50_ms': percentile(last_quarter, 0.50),
+        'error_rate': len(errors) / total,
+        'errors': errors,
+        'p50_ms': percentile(latencies, 0.50),
+        'p90_ms': percentile(latencies, 0.90),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+        'histogram': histogram,
+    }
+
+def print_step(result):
+    print(f"  offered {result['offered_rate']:.1f} req/s -> achieved {result['throughput']:.1f} req/s, "
+          f"errors {result['error_rate'] * 100:.1f}%")
+    print(f"  latency p50 {result['p50_ms']:.1f}ms  p90 {result['p90_ms']:.1f}ms  "
+          f"p99 {result['p99_ms']:.1f}ms  max {result['max_ms']:.1f}ms")
+    print(f"  p50 first quarter {result['first_quarter_p50_ms']:.1f}ms -> last quarter "
+          f"{result['last_quarter_p50_ms']:.1f}ms, drain after last arrival {result['drain_s']:.2f}s")
+    peak = max(result['histogram']) or 1
+    lower = 0
+    for bound, count in zip(HISTOGRAM_BOUNDS, result['histogram']):
+        label = f"{lower:g}-{bound:g}ms" if bound != float('inf') else f">{lower:g}ms"
+        if count:
+            print(f"    {label:>14} {count:>7} {'#' * max(1, int(40 * count / peak))}")
+        lower = bound
+    if result['errors']:
+        kinds = {}
+        for error in result['errors']:
+            kinds[error] = kinds.get(error, 0) + 1
+        print(f"  error breakdown: {kinds}")
+
+def saturation_reason(result, slo_ms, max_error_rate, min_efficiency, max_backlog_growth):
+    """Why this step counts as saturated, or None if the server kept up"""
+    # A queue building up makes late requests wait longer than early ones
+    growth_ms = result['last_quarter_p50_ms'] - result['first_quarter_p50_ms']
+    if growth_ms > max(max_backlog_growth * result['first_quarter_p50_ms'], MIN_BACKLOG_GROWTH_MS):
+        return f"backlog building up (p50 grew {growth_ms:.0f}ms during the step)"
+    if result['throughput'] < min_efficiency * result['offered_rate'] * (1 - result['error_rate']):
+        return 'throughput fell behind the offered rate'
+    if result['error_rate'] > max_error_rate:
+        return f"error rate above {max_error_rate * 100:.1f}%"
+    if slo_ms is not None and result['p99_ms'] > slo_ms:
+        return f"p99 above the {slo_ms:g}ms SLO"
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load test for the SmartBin /predict endpoint')
+    parser.add_argument('--url', default='http://localhost:5000/predict',
+                        help='endpoint accepting a multipart "file" upload (local only)')
+    parser.add_argument('--images', default=None,
+                        help='directory of images to replay (default: generate synthetic images)')
+    parser.add_argument('--synthetic', type=int, default=16, help='number of synthetic images to generate')
+    parser.add_argument('--rates', type=parse_float_list, default=[1, 2, 5, 10, 20, 50],
+                        help='offered request rates to ramp through, req/s (default: 1,2,5,10,20,50)')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per rate step')
+    parser.add_argument('--slo-ms', type=float, default=None, help='p99 latency SLO in milliseconds')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--min-efficiency', type=float, default=0.95,
+                        help='achieved/offered throughput below this marks saturation')
+    parser.add_argument('--max-backlog-growth', type=float, default=0.5,
+                        help='last-quarter p50 exceeding the first-quarter p50 by this fraction marks saturation')
+    parser.add_argument('--max-in-flight', type=int, default=256,
+                        help='client threads; should stay well above rate x latency')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--keep-going', action='store_true', help='run every step even after saturation')
+    args = parser.parse_args()
+
+    if not args.rates or any(rate <= 0 for rate in args.rates):
+        sys.exit("--rates must be a list of positive request rates")
+    if args.duration <= 0:
+        sys.exit("--duration must be positive")
+
+    target = Target(args.url, args.timeout)
+    ensure_local(target.host)
+
+    corpus = load_corpus(args.images, args.synthetic)
+    requests_pool = [encode_multipart(name, data) for name, data in corpus]
+
+    print("=" * 60)
+    print(f"SmartBin load test: {args.url}")
+    print(f"Corpus: {len(corpus)} images, {args.duration:g}s per step")
+    print("=" * 60)
+
+    results = []
+    saturated_at = None
+    for rate in args.rates:
+        print(f"\nStep: {rate:g} req/s")
+        result = run_step(target, requests_pool, rate, args.duration, args.max_in_flight)
+        results.append(result)
+        print_step(result)
+
+        reason = saturation_reason(result, args.slo_ms, args.max_error_rate, args.min_efficiency,
+                                   args.max_backlog_growth)
+        if reason and saturated_at is None:
+            saturated_at = (rate, reason)
+            print(f"  ✗ saturated: {reason}")
+            if not args.keep_going:
+                break
+
+    print("\n" + "=" * 60)
+    print(f"{'offered':>8} {'achieved':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8} {'drain s':>8}")
+    for result in results:
+        print(f"{result['offered_rate']:>8g} {result['throughput']:>9.1f} {result['error_rate'] * 100:>6.1f}% "
+              f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['drain_s']:>8.2f}")
+
+    if saturated_at is None:
+        print(f"\nNo saturation up to {args.rates[-1]:g} req/s")
+    else:
+        passing = [r['offered_rate'] for r in results if r['offered_rate'] < saturated_at[0]]
+        sustainable = f"{max(passing):g} req/s" if passing else 'below the first step'
+        print(f"\nSaturated at {saturated_at[0]:g} req/s ({saturated_at[1]}); "
+              f"highest sustainable step: {sustainable}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Measure per-worker memory as the number of inference workers grows.
+
+For each model mode and worker count, starts that many worker processes,
+has each load the model and run a few predictions, then reads
+/proc/<pid>/smaps_rollup to report per worker:
+
+    RSS  resident pages, counting shared pages in full
+    PSS  shared pages divided among the processes mapping them
+    USS  pages private to the worker (what one more worker really costs)
+
+In "shared" mode the weights live in the memory-mapped serving file, so
+they show up in PSS (split between workers) but not in USS.
+
+Linux only. Run from the backend directory, next to the model file.
+
+Usage:
+    python measure_memory.py --workers 1,2,4,8 --modes keras,shared
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import runtime_config
+
+READY_MARKER = 'WORKER_READY'
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def read_memory_kb(pid):
+    """Return RSS, PSS and USS (kB) of a process from /proc"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+def run_worker(args):
+    """Load the model the way app.py would, run a few predictions, then idle until told to exit"""
+    config = runtime_config.apply_runtime_config()
+
+    import numpy as np
+    from utils import load_model_safely, load_model_shared
+
+    if config['model_mode'] == 'shared':
+        model = load_model_shared(num_threads=config['intra_op_threads'])
+    else:
+        model = load_model_safely()
+    if model is None:
+        print("Model could not be loaded", file=sys.stderr)
+        sys.exit(1)
+
+    batch = np.random.rand(1, 224, 224, 3).astype(np.float32)
+    for _ in range(args.predictions):
+        model.predict(batch, verbose=0)
+
+    print(READY_MARKER, flush=True)
+    sys.stdin.read()
+
+def measure(args, mode, worker_count):
+    """Start `worker_count` workers in `mode` and return their memory readings"""
+    env = dict(os.environ)
+    env[runtime_config.MODEL_MODE_ENV] = mode
+    env['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    command = [sys.executable, os.path.abspath(__file__), '--worker', '--predictions', str(args.predictions)]
+
+    workers = []
+    try:
+        for index in range(worker_count):
+            worker_env = dict(env, **{runtime_config.WORKER_INDEX_ENV: str(index)})
+            workers.append(subprocess.Popen(command, env=worker_env, stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True))
+
+        for worker in workers:
+            for line in worker.stdout:
+                if line.strip() == READY_MARKER:
+                    break
+            else:
+                raise RuntimeError(f"worker {worker.pid} exited before loading the model")
+
+        return [read_memory_kb(worker.pid) for worker in workers]
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.stdin.close()
+        for worker in workers:
+            worker.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='Report per-worker PSS/USS for each model loading mode')
+    parser.add_argument('--workers', type=parse_int_list, default=[1, 2, 4, 8],
+                        help='worker counts to measure (default: 1,2,4,8)')
+    parser.add_argument('--modes', default='keras,shared',
+                        help='model modes to compare (default: keras,shared)')
+    parser.add_argument('--predictions', type=int, default=5, help='predictions each worker runs before measuring')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit("This script needs Linux /proc/<pid>/smaps_rollup")
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    for mode in modes:
+        if mode not in runtime_config.MODEL_MODES:
+            sys.exit(f"Unknown mode '{mode}'. Choose from: {', '.join(runtime_config.MODEL_MODES)}")
+
+    print("=" * 60)
+    print("SmartBin worker memory")
+    print("=" * 60)
+
+    if 'shared' in modes:
+        # Export up front, as a deployment would, so no measured worker pays for the conversion
+        print("Exporting serving model...")
+        export_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export_model.py')
+        if subprocess.run([sys.executable, export_script]).returncode != 0:
+            sys.exit("Could not export the serving model")
+
+    print(f"\n{'mode':>7} {'workers':>7} {'RSS/wkr MB':>11} {'PSS/wkr MB':>11} {'USS/wkr MB':>11} {'total PSS MB':>13}")
+    for mode in modes:
+        for worker_count in args.workers:
+            try:
+                readings = measure(args, mode, worker_count)
+            except RuntimeError as e:
+                print(f"✗ {mode} x{worker_count}: {e}")
+                break
+            total_pss = sum(r['pss'] for r in readings) / 1024
+            print(f"{mode:>7} {worker_count:>7} "
+                  f"{sum(r['rss'] for r in readings) / 1024 / worker_count:>11.1f} "
+                  f"{total_pss / worker_count:>11.1f} "
+                  f"{sum(r['uss'] for r in readings) / 1024 / worker_count:>11.1f} "
+                  f"{total_pss:>13.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import numpy as np
+from models import WASTE_CATEGORIES
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; run a single worker process there
+    fcntl = None
+
+LOG_PATH = os.environ.get('SMARTBIN_PREDICTION_LOG', 'predictions.bin')
+
+# One fixed-size (26 byte) little-endian record per /predict result
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('category_id', 'u1'),
+    ('type_code', 'u1'),
+    ('confidence', '<f4'),
+    ('latency_ms', '<f4'),
+    ('model_version', 'S8'),
+])
+
+WASTE_TYPES = ['Non-Biodegradable', 'Biodegradable', 'Unknown']
+
+# Records read per chunk when catching up on the log (~26 MB)
+REPLAY_CHUNK_RECORDS = 1_000_000
+
+# Rollup row layout: one count column per category, then running sums for averages
+NUM_CATEGORIES = len(WASTE_CATEGORIES)
+CONFIDENCE_COLUMN = NUM_CATEGORIES
+LATENCY_COLUMN = NUM_CATEGORIES + 1
+ROLLUP_COLUMNS = NUM_CATEGORIES + 2
+
+def type_code(waste_type):
+    return WASTE_TYPES.index(waste_type) if waste_type in WASTE_TYPES else WASTE_TYPES.index('Unknown')
+
+def _lock_file(f, exclusive):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class BucketRollup:
+    """Cumulative per-bucket totals for one bucket width.
+
+    Row i holds the totals of every retained record up to and including bucket
+    first_bucket + i, so the totals over any bucket range are the difference
+    of two rows, regardless of how much history is retained.
+    """
+
+    def __init__(self, width_seconds, max_buckets):
+        self.width = width_seconds
+        self.max_buckets = max_buckets
+        self.first_bucket = None
+        self.rows = np.zeros((0, ROLLUP_COLUMNS))
+        self.size = 0
+
+    def bucket_of(self, timestamp):
+        return int(timestamp // self.width)
+
+    def last_bucket(self):
+        return self.first_bucket + self.size - 1
+
+    def _extend_to(self, bucket):
+        """Grow the table so it covers `bucket`, carrying the last total forward over gaps"""
+        needed = bucket - self.first_bucket + 1
+        if needed <= self.size:
+            return
+        if needed > len(self.rows):
+            grown = np.zeros((max(needed, 2 * len(self.rows), 64), ROLLUP_COLUMNS))
+            grown[:self.size] = self.rows[:self.size]
+            self.rows = grown
+        self.rows[self.size:needed] = self.rows[self.size - 1] if self.size else 0
+        self.size = needed
+
+        # Drop the oldest buckets once well past retention (amortised, by halving)
+        if self.size > 2 * self.max_buckets:
+            drop = self.size - self.max_buckets
+            self.rows[:self.max_buckets] = self.rows[drop:self.size] - self.rows[drop - 1]
+            self.first_bucket += drop
+            self.size = self.max_buckets
+
+    def add_batch(self, records):
+        """Fold a batch of records (RECORD_DTYPE array) into the cumulative table"""
+        if len(records) == 0:
+            return
+        buckets = (records['timestamp'] // self.width).astype(np.int64)
+        high = int(buckets.max())
+        if self.first_bucket is None:
+            self.first_bucket = max(int(buckets.min()), high - self.max_buckets + 1)
+        self._extend_to(high)
+
+        # Anything older than the retained window can no longer be represented
+        keep = buckets >= self.first_bucket
+        records, buckets = records[keep], buckets[keep]
+        if len(records) == 0:
+            return
+        low, high = int(buckets.min()), int(buckets.max())
+
+        # Per-bucket deltas over [low, high], turned into running totals
+        deltas = np.zeros((high - low + 1, ROLLUP_COLUMNS))
+        offsets = buckets - low
+        np.add.at(deltas, (offsets, records['category_id'].astype(np.int64)), 1)
+        np.add.at(deltas[:, CONFIDENCE_COLUMN], offsets, records['confidence'])
+        np.add.at(deltas[:, LATENCY_COLUMN], offsets, records['latency_ms'])
+        running = np.cumsum(deltas, axis=0)
+
+        start = low - self.first_bucket
+        end = high - self.first_bucket + 1
+        self.rows[start:end] += running
+        self.rows[end:self.size] += running[-1]
+
+    def to_arrays(self, name):
+        """Arrays describing this rollup, for saving with np.savez"""
+        first_bucket = -1 if self.first_bucket is None else self.first_bucket
+        return {
+            f'{name}_meta': np.array([self.width, self.max_buckets, first_bucket, self.size], dtype=np.int64),
+            f'{name}_rows': self.rows[:self.size].copy(),
+        }
+
+    def load_arrays(self, arrays, name):
+        """Restore from to_arrays() output; False if it was saved with a different layout"""
+        width, max_buckets, first_bucket, size = (int(v) for v in arrays[f'{name}_meta'])
+        rows = arrays[f'{name}_rows']
+        if width != self.width or max_buckets != self.max_buckets or rows.shape[1:] != (ROLLUP_COLUMNS,):
+            return False
+        self.first_bucket = None if first_bucket < 0 else first_bucket
+        self.rows = np.array(rows, dtype=np.float64)
+        self.size = size
+        return True
+
+    def totals(self, start_ts, end_ts):
+        """Totals over the buckets touching [start_ts, end_ts] as (row, clamped_start, clamped_end)"""
+        if self.size == 0:
+            return np.zeros(ROLLUP_COLUMNS), start_ts, end_ts
+        start = max(self.bucket_of(start_ts), self.first_bucket)
+        end = min(self.bucket_of(end_ts), self.last_bucket())
+        if end < start:
+            return np.zeros(ROLLUP_COLUMNS), start_ts, end_ts
+        row = self.rows[end - self.first_bucket].copy()
+        if start > self.first_bucket:
+            row -= self.rows[start - 1 - self.first_bucket]
+        return row, start * self.width, (end + 1) * self.width
+
+class PredictionLog:
+    """Append-only binary log of predictions, written in batches by a background thread.
+
+    The log file is the shared source of truth when several worker processes
+    serve the app: each appends its own batches under an exclusive file lock,
+    and each folds new records into its per-minute and per-hour rollups by
+    reading only the log tail past the offset it has already folded. Queries
+    catch up on that tail first, so every worker answers from the same data.
+
+    Rollups are saved next to the log along with the log offset they cover,
+    so a restart loads them and replays only the records appended since.
+    """
+
+    def __init__(self, path, batch_size=256, flush_interval=1.0, snapshot_interval=60.0,
+                 minute_retention=7 * 24 * 60, hour_retention=5 * 365 * 24):
+        self.path = path
+        self.snapshot_path = f"{path}.rollups.npz"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.minute_retention = minute_retention
+        self.hour_retention = hour_retention
+        self.rollups = self._new_rollups()
+        # Bytes of the log already folded into the rollups
+        self.offset = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _new_rollups(self):
+        return {
+            'minute': BucketRollup(60, self.minute_retention),
+            'hour': BucketRollup(3600, self.hour_retention),
+        }
+
+    def record(self, category_id, waste_type, confidence, model_version, latency_ms):
+        """Queue one prediction; never blocks on disk I/O"""
+        self._queue.put((time.time(), category_id, type_code(waste_type), confidence,
+                         latency_ms, model_version.encode('ascii', 'replace')[:8]))
+
+    def start(self):
+        """Load saved rollups, fold in the log tail written since, and start the writer thread"""
+        if self._thread is not None:
+            return
+        loaded = self._load_snapshot()
+        replayed = self._catch_up()
+        print(f"Prediction log: {'loaded saved rollups, ' if loaded else ''}"
+              f"replayed {replayed} records from {self.path}")
+        self._thread = threading.Thread(target=self._writer, name='prediction-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Flush pending records, save the rollups and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._catch_up()
+        self._save_snapshot()
+
+    def _catch_up(self):
+        """Fold records appended to the log (by any worker) since the last catch-up, in chunks"""
+        if not os.path.exists(self.path):
+            return 0
+        folded = 0
+        with self._lock:
+            with open(self.path, 'rb') as log_file:
+                # Writers hold the exclusive lock while appending, so this size covers whole batches
+                _lock_file(log_file, exclusive=False)
+                try:
+                    size = os.fstat(log_file.fileno()).st_size
+                finally:
+                    _unlock_file(log_file)
+                # Ignore a partial trailing record left by a crashed writer
+                usable = size - size % RECORD_DTYPE.itemsize
+
+                if usable < self.offset:
+                    print("Prediction log shrank or was replaced; rebuilding rollups")
+                    self.rollups = self._new_rollups()
+                    self.offset = 0
+
+                log_file.seek(self.offset)
+                while self.offset < usable:
+                    count = min(REPLAY_CHUNK_RECORDS, (usable - self.offset) // RECORD_DTYPE.itemsize)
+                    records = np.frombuffer(log_file.read(count * RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)
+                    if len(records) == 0:
+                        break
+                    for rollup in self.rollups.values():
+                        rollup.add_batch(records)
+                    self.offset += len(records) * RECORD_DTYPE.itemsize
+                    folded += len(records)
+        return folded
+
+    def _save_snapshot(self):
+        with self._lock:
+            arrays = {'offset': np.array([self.offset], dtype=np.int64)}
+            for name, rollup in self.rollups.items():
+                arrays.update(rollup.to_arrays(name))
+        # Write then rename so other workers never load a half-written snapshot
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Prediction log snapshot error: {str(e)}")
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with np.load(self.snapshot_path) as arrays:
+                offset = int(arrays['offset'][0])
+                log_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                if offset > log_size:
+                    print("Saved rollups are ahead of the prediction log; rebuilding")
+                    return False
+                rollups = self._new_rollups()
+                for name, rollup in rollups.items():
+                    if not rollup.load_arrays(arrays, name):
+                        print("Saved rollups use a different layout; rebuilding")
+                        return False
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Could not load saved rollups ({str(e)}); rebuilding")
+            return False
+        with self._lock:
+            self.rollups = rollups
+            self.offset = offset
+        return True
+
+    def _writer(self):
+        last_snapshot = time.monotonic()
+        with open(self.path, 'ab') as log_file:
+            stopping = False
+            while not stopping:
+                pending = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(pending) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    pending.append(item)
+
+                if pending:
+                    self._append(log_file, np.array(pending, dtype=RECORD_DTYPE))
+                    self._catch_up()
+
+                if time.monotonic() - last_snapshot >= self.snapshot_interval:
+                    self._catch_up()
+                    self._save_snapshot()
+                    last_snapshot = time.monotonic()
+
+    def _append(self, log_file, records):
+        _lock_file(log_file, exclusive=True)
+        try:
+            # A worker that crashed mid-write can leave a partial record; trim it to keep records aligned
+            size = os.fstat(log_file.fileno()).st_size
+            if size % RECORD_DTYPE.itemsize:
+                log_file.truncate(size - size % RECORD_DTYPE.itemsize)
+            log_file.write(records.tobytes())
+            log_file.flush()
+        except OSError as e:
+            print(f"Prediction log write error: {str(e)}")
+        finally:
+            _unlock_file(log_file)
+
+    def query(self, start_ts, end_ts, resolution='minute'):
+        """Per-category counts and averages over [start_ts, end_ts].
+
+        Catches up on records other workers appended, then answers in constant
+        time from the rollups.
+        """
+        self._catch_up()
+        with self._lock:
+            row, start, end = self.rollups[resolution].totals(start_ts, end_ts)
+
+        counts = row[:NUM_CATEGORIES]
+        total = int(counts.sum())
+        by_type = {waste_type: 0 for waste_type in WASTE_TYPES}
+        by_category = []
+        for category in WASTE_CATEGORIES:
+            count = int(counts[category['id']])
+            by_type[category['type']] = by_type.get(category['type'], 0) + count
+            by_category.append({
+                'id': category['id'],
+                'name': category['name'],
+                'type': category['type'],
+                'count': count
+            })
+
+        return {
+            'start': start,
+            'end': end,
+            'resolution': resolution,
+            'total': total,
+            'by_category': by_category,
+            'by_type': by_type,
+            'avg_confidence': round(row[CONFIDENCE_COLUMN] / total, 2) if total else None,
+            'avg_latency_ms': round(row[LATENCY_COLUMN] / total, 2) if total else None
+        }
+
+prediction_log = PredictionLog(LOG_PATH)
@@ -1,10 +1,25 @@
 from flask import request, jsonify, render_template
 from PIL import Image
 import io
+import json
+import math
+import time
 import traceback
-import tensorflow as tf
 from models import WASTE_CATEGORIES, get_disposal_info
-from utils import preprocess_image, generate_mock_predictions, model
+import utils
+from utils import (preprocess_image, classify_image, decode_frame_signature, signature_distance,
+                   get_model_version, get_tensorflow_version)
+from prediction_log import prediction_log
+
+# Returned when the model produces no usable prediction
+DEFAULT_TOP_PREDICTION = {
+    'id': 9, 'name': 'Other', 'type': 'Unknown', 'probability': 0,
+    'color': '#7f8c8d', 'icon': 'fas fa-question'
+}
+
+# Frames whose signature differs from the last classified frame by less than this are skipped
+STREAM_CHANGE_THRESHOLD = 0.03
+MAX_FRAME_SIZE = 10 * 1024 * 1024
 
 def home():
     return render_template('index.html')
@@ -17,6 +32,9 @@ def get_categories():
     })
 
 def predict():
+    started = time.perf_counter()
+    # Read at request time: app.py sets utils.model after this module is imported
+    model = utils.model
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file uploaded'}), 400
@@ -49,84 +67,22 @@ def predict():
 
         processed_image = preprocess_image(image)
 
-        # Check if we have a real model or using demo mode
-        if model is None:
-            print("Using demo mode for prediction")
-            predictions_data = generate_mock_predictions(file.filename)
-        else:
-            try:
-                # Make prediction with the model
-                model_predictions = model.predict(processed_image, verbose=0)
-
-                # Convert model predictions to our format
-                predictions_data = []
-
-                # Assuming model outputs probabilities for each class
-                if len(model_predictions.shape) == 2 and model_predictions.shape[1] >= len(WASTE_CATEGORIES):
-                    # Model has multiple outputs (one per class)
-                    for i in range(min(len(WASTE_CATEGORIES), model_predictions.shape[1])):
-                        prob = float(model_predictions[0][i]) * 100
-                        if prob > 1:  # Only include predictions with significant probability
-                            category = WASTE_CATEGORIES[i]
-                            predictions_data.append({
-                                'id': category['id'],
-                                'name': category['name'],
-                                'type': category['type'],
-                                'probability': round(prob, 2),
-                                'color': category['color'],
-                                'icon': category['icon']
-                            })
-                elif len(model_predictions.shape) == 2 and model_predictions.shape[1] == 2:
-                    # Binary classification output
-                    prob_bio = float(model_predictions[0][1]) * 100
-                    prob_non_bio = float(model_predictions[0][0]) * 100
-
-                    # Distribute probabilities among categories based on type
-                    bio_categories = [cat for cat in WASTE_CATEGORIES if cat['type'] == 'Biodegradable']
-                    non_bio_categories = [cat for cat in WASTE_CATEGORIES if cat['type'] == 'Non-Biodegradable']
-
-                    # For demo, assign probabilities to top categories
-                    predictions_data = [
-                        {
-                            'id': bio_categories[0]['id'] if bio_categories else 5,
-                            'name': bio_categories[0]['name'] if bio_categories else 'Organic/Food',
-                            'type': 'Biodegradable',
-                            'probability': round(prob_bio, 2),
-                            'color': '#2ecc71',
-                            'icon': 'fas fa-leaf'
-                        },
-                        {
-                            'id': non_bio_categories[0]['id'] if non_bio_categories else 0,
-                            'name': non_bio_categories[0]['name'] if non_bio_categories else 'Plastic',
-                            'type': 'Non-Biodegradable',
-                            'probability': round(prob_non_bio, 2),
-                            'color': '#e74c3c',
-                            'icon': 'fas fa-trash-alt'
-                        }
-                    ]
-                else:
-                    # Fallback to mock predictions
-                    predictions_data = generate_mock_predictions(file.filename)
-
-            except Exception as e:
-                print(f"Model prediction error: {str(e)}")
-                predictions_data = generate_mock_predictions(file.filename)
-
-        # Sort predictions by probability (highest first)
-        predictions_data.sort(key=lambda x: x['probability'], reverse=True)
+        # Run the model (or demo mode); results come back sorted by probability
+        predictions_data = classify_image(model, processed_image, file.filename)
 
         # Get top 3-4 predictions
         top_predictions = predictions_data[:4]
 
         # Get top prediction
-        top_prediction = top_predictions[0] if top_predictions else {
-            'id': 9, 'name': 'Other', 'type': 'Unknown', 'probability': 0,
-            'color': '#7f8c8d', 'icon': 'fas fa-question'
-        }
+        top_prediction = top_predictions[0] if top_predictions else DEFAULT_TOP_PREDICTION
 
         # Get disposal info for top prediction
         disposal_info = get_disposal_info(top_prediction['name'], top_prediction['type'])
 
+        # Queue the result for the prediction log; written in batches off the request path
+        prediction_log.record(top_prediction['id'], top_prediction['type'], top_prediction['probability'],
+                              get_model_version(model), (time.perf_counter() - started) * 1000)
+
         return jsonify({
             'success': True,
             'predictions': top_predictions,
@@ -148,6 +104,103 @@ def predict():
         traceback.print_exc()
         return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
 
+def stream(ws):
+    """WebSocket endpoint for continuous camera feeds.
+
+    The device sends each frame as a binary message containing an encoded image.
+    Frames that barely changed since the last classified frame are skipped, and a
+    result is only pushed back when the top prediction changes.
+    Optional query args: ?threshold=<0-1>&device=<name>
+    """
+    model = utils.model
+    threshold = request.args.get('threshold', STREAM_CHANGE_THRESHOLD, type=float)
+    if not math.isfinite(threshold):
+        threshold = STREAM_CHANGE_THRESHOLD
+    threshold = min(max(threshold, 0.0), 1.0)
+    device = request.args.get('device', 'camera')
+
+    last_signature = None
+    last_top_id = None
+    frames_received = 0
+    frames_classified = 0
+
+    while True:
+        data = ws.receive()
+        if data is None:
+            continue
+
+        if isinstance(data, str):
+            ws.send(json.dumps({'error': 'Frames must be sent as binary image messages'}))
+            continue
+
+        # Backstop: SOCK_SERVER_OPTIONS in app.py already caps the message size
+        if len(data) > MAX_FRAME_SIZE:
+            ws.send(json.dumps({'error': 'Frame too large. Maximum size is 10MB'}))
+            continue
+
+        frames_received += 1
+
+        try:
+            signature = decode_frame_signature(data)
+        except Exception as e:
+            ws.send(json.dumps({'error': f'Could not decode frame: {str(e)}'}))
+            continue
+
+        # Skip inference when the scene has barely changed
+        if last_signature is not None and signature_distance(signature, last_signature) < threshold:
+            continue
+
+        # Only frames that will be classified get a full-resolution decode
+        try:
+            image = Image.open(io.BytesIO(data)).convert('RGB')
+        except Exception as e:
+            ws.send(json.dumps({'error': f'Could not decode frame: {str(e)}'}))
+            continue
+        last_signature = signature
+        frames_classified += 1
+
+        predictions_data = classify_image(model, preprocess_image(image), device)
+        top_predictions = predictions_data[:4]
+        top_prediction = top_predictions[0] if top_predictions else DEFAULT_TOP_PREDICTION
+
+        # Only push a result when the top prediction changes
+        if top_prediction['id'] == last_top_id:
+            continue
+        last_top_id = top_prediction['id']
+
+        ws.send(json.dumps({
+            'success': True,
+            'predictions': top_predictions,
+            'top_prediction': top_prediction,
+            'disposal': get_disposal_info(top_prediction['name'], top_prediction['type']),
+            'stream_info': {
+                'frames_received': frames_received,
+                'frames_classified': frames_classified
+            },
+            'model_info': {
+                'total_categories': len(WASTE_CATEGORIES),
+                'is_demo': model is None
+            }
+        }))
+
+def get_stats():
+    """Per-category prediction counts over a time range, answered from the rollups.
+    Query args: ?start=<unix ts>&end=<unix ts>&resolution=minute|hour (default: last hour by minute)
+    """
+    now = time.time()
+    end = request.args.get('end', now, type=float)
+    start = request.args.get('start', end - 3600, type=float)
+    resolution = request.args.get('resolution', 'minute')
+
+    if not (math.isfinite(start) and math.isfinite(end)):
+        return jsonify({'error': 'start and end must be finite unix timestamps'}), 400
+    if resolution not in prediction_log.rollups:
+        return jsonify({'error': 'Invalid resolution. Use "minute" or "hour"'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+
+    return jsonify(prediction_log.query(start, end, resolution))
+
 def test():
     """Test endpoint with sample prediction"""
     # Generate sample predictions for testing
@@ -170,14 +223,16 @@ def test():
 def health_check():
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None,
+        'model_loaded': utils.model is not None,
         'waste_categories': len(WASTE_CATEGORIES),
-        'tensorflow_version': tf.__version__,
+        'tensorflow_version': get_tensorflow_version(),
         'endpoints': {
             'GET /': 'Home page',
             'POST /predict': 'Upload image for classification',
+            'WS /stream': 'Stream camera frames for continuous classification',
             'GET /api/health': 'Server health check',
             'GET /test': 'Test endpoint with sample data',
-            'GET /api/categories': 'Get all waste categories'
+            'GET /api/categories': 'Get all waste categories',
+            'GET /api/stats': 'Prediction counts per category over a time range'
         }
     })
@@ -0,0 +1,149 @@
+import os
+
+# Environment variables controlling the inference runtime. Unset means "use TensorFlow's default".
+INTRA_OP_THREADS_ENV = 'SMARTBIN_INTRA_OP_THREADS'    # threads used inside a single op (matmul, conv)
+INTER_OP_THREADS_ENV = 'SMARTBIN_INTER_OP_THREADS'    # independent ops run concurrently
+ONEDNN_ENV = 'SMARTBIN_ONEDNN'                        # 1/0 to force oneDNN (MKL) kernels on/off
+CPU_CORES_ENV = 'SMARTBIN_CPU_CORES'                  # explicit core list, e.g. "0-7" or "0,2,4,6"
+CORES_PER_WORKER_ENV = 'SMARTBIN_CORES_PER_WORKER'    # give each worker its own slice of cores...
+WORKER_INDEX_ENV = 'SMARTBIN_WORKER_INDEX'            # ...selected by this worker's index (0, 1, 2, ...)
+MODEL_MODE_ENV = 'SMARTBIN_MODEL_MODE'                # "keras" (default) or "shared" (memory-mapped weights)
+
+MODEL_MODES = ('keras', 'shared')
+
+# Settings applied in this process, filled in by apply_runtime_config()
+active_config = None
+
+def parse_core_list(spec):
+    """Parse a core list like "0-3,8,10-11" into a sorted list of core ids"""
+    cores = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cores.update(range(int(start), int(end) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+def _int_env(name):
+    value = os.environ.get(name, '').strip()
+    return int(value) if value else None
+
+def get_runtime_config():
+    """Read the runtime configuration from the environment"""
+    onednn = os.environ.get(ONEDNN_ENV, '').strip()
+    cores = os.environ.get(CPU_CORES_ENV, '').strip()
+    model_mode = os.environ.get(MODEL_MODE_ENV, '').strip().lower() or 'keras'
+    if model_mode not in MODEL_MODES:
+        print(f"Warning: unknown {MODEL_MODE_ENV} '{model_mode}', using 'keras'")
+        model_mode = 'keras'
+    return {
+        'intra_op_threads': _int_env(INTRA_OP_THREADS_ENV),
+        'inter_op_threads': _int_env(INTER_OP_THREADS_ENV),
+        'onednn': (onednn not in ('0', 'false', 'False')) if onednn else None,
+        'cpu_cores': parse_core_list(cores) if cores else None,
+        'cores_per_worker': _int_env(CORES_PER_WORKER_ENV),
+        'worker_index': _int_env(WORKER_INDEX_ENV),
+        'model_mode': model_mode,
+    }
+
+def resolve_worker_cores(config):
+    """Work out which cores this process should be pinned to, or None to leave affinity alone"""
+    if config['cores_per_worker'] is None and config['cpu_cores'] is None:
+        return None
+
+    if not hasattr(os, 'sched_setaffinity'):
+        print("Warning: CPU pinning is not supported on this platform")
+        return None
+
+    if config['cores_per_worker'] is None:
+        return config['cpu_cores']
+
+    if config['worker_index'] is None:
+        # Defaulting to 0 would pin every worker to the same slice, the very oversubscription to avoid
+        _pinning_disabled(f"{CORES_PER_WORKER_ENV} is set but {WORKER_INDEX_ENV} is not.",
+                          f"Set {WORKER_INDEX_ENV} to a distinct 0-based index for each worker process.")
+        return None
+
+    available = config['cpu_cores'] or sorted(os.sched_getaffinity(0))
+    per_worker = config['cores_per_worker']
+    worker_index = config['worker_index']
+    if per_worker <= 0 or worker_index < 0:
+        _pinning_disabled(f"{CORES_PER_WORKER_ENV} must be positive and {WORKER_INDEX_ENV} non-negative.")
+        return None
+    if (worker_index + 1) * per_worker > len(available):
+        # Wrapping around would put this worker on cores another worker already owns
+        _pinning_disabled(f"Worker {worker_index} needs core slots {worker_index * per_worker}-"
+                          f"{(worker_index + 1) * per_worker - 1}, but only {len(available)} cores "
+                          f"are available ({describe_cores(available)}).",
+                          f"Run at most {len(available) // per_worker} workers with "
+                          f"{CORES_PER_WORKER_ENV}={per_worker}, or lower {CORES_PER_WORKER_ENV}.")
+        return None
+
+    start = worker_index * per_worker
+    return available[start:start + per_worker]
+
+def _pinning_disabled(warning, hint=None):
+    print("=" * 60)
+    print(f"WARNING: {warning}")
+    if hint:
+        print(hint)
+    print("CPU pinning is DISABLED for this process.")
+    print("=" * 60)
+
+def apply_runtime_config(config=None):
+    """Apply thread pool, oneDNN and core-placement settings.
+
+    Must run before TensorFlow is imported anywhere in the process: oneDNN is
+    chosen at import time and the thread pools are fixed once the runtime starts.
+    """
+    global active_config
+    if config is None:
+        config = get_runtime_config()
+    config = dict(config)
+
+    if config['onednn'] is not None:
+        os.environ['TF_ENABLE_ONEDNN_OPTS'] = '1' if config['onednn'] else '0'
+
+    cores = resolve_worker_cores(config)
+    if cores:
+        os.sched_setaffinity(0, cores)
+    config['pinned_cores'] = cores
+
+    # Size the op pool to the pinned cores so TF does not spawn a thread per machine core
+    if config['intra_op_threads'] is None and cores:
+        config['intra_op_threads'] = len(cores)
+
+    # Shared mode passes intra_op_threads to the TFLite interpreter instead; importing
+    # TensorFlow just to size its pools would cost every worker its whole heap
+    if config['model_mode'] != 'shared':
+        import tensorflow as tf
+        if config['intra_op_threads'] is not None:
+            tf.config.threading.set_intra_op_parallelism_threads(config['intra_op_threads'])
+        if config['inter_op_threads'] is not None:
+            tf.config.threading.set_inter_op_parallelism_threads(config['inter_op_threads'])
+
+    print(f"Runtime config: intra_op={config['intra_op_threads'] or 'default'}, "
+          f"inter_op={config['inter_op_threads'] or 'default'}, "
+          f"oneDNN={'default' if config['onednn'] is None else config['onednn']}, "
+          f"cores={describe_cores(cores)}, model mode={config['model_mode']}")
+
+    active_config = config
+    return config
+
+def describe_cores(cores):
+    """Format a core list compactly, e.g. [0, 1, 2, 5] -> "0-2,5" """
+    if not cores:
+        return 'all'
+    ranges = []
+    start = prev = cores[0]
+    for core in cores[1:]:
+        if core != prev + 1:
+            ranges.append(f"{start}-{prev}" if start != prev else str(start))
+            start = core
+        prev = core
+    ranges.append(f"{start}-{prev}" if start != prev else str(start))
+    return ','.join(ranges)
@@ -0,0 +1,289 @@
+"""Benchmark a grid of runtime settings on this machine and recommend one.
+
+Each combination runs in a fresh subprocess, because TensorFlow fixes its
+thread pools and oneDNN choice once the runtime starts. The settings are
+passed through the same SMARTBIN_* environment variables that app.py reads,
+so the recommendation can be copied straight into the server's environment.
+
+To reproduce the contention seen in production, each sweep point also sets
+how many worker processes run at once (--workers, optionally pinned with
+--cores-per-worker) and how many requests each worker serves concurrently
+(--concurrency, standing in for Flask's request threads). Workers start
+measuring together and results are summed across them. The recommendation
+is the highest total throughput whose per-request p99 meets the budget, for
+--serving-batch-size (default 1, what the server runs); other batch sizes
+are reported for comparison only.
+
+Usage:
+    python thread_sweep.py --intra 1,2,4,8 --inter 1,2 --onednn 0,1 \
+        --workers 1,2,4 --concurrency 1,4 --cores-per-worker 8 --max-latency-ms 200
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import runtime_config
+
+RESULT_MARKER = 'SWEEP_RESULT '
+READY_MARKER = 'SWEEP_READY'
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def run_worker(args):
+    """Benchmark the model in this process (called inside each sweep subprocess)"""
+    config = runtime_config.apply_runtime_config()
+
+    import numpy as np
+    import tensorflow as tf
+    from models import WASTE_CATEGORIES
+    from utils import load_model_safely, load_model_shared, export_serving_model, SharedWeightsModel
+
+    # Load the model the way app.py does, so the settings are measured on the runtime that serves
+    if config['model_mode'] == 'shared':
+        model = load_model_shared(num_threads=config['intra_op_threads'])
+    else:
+        model = load_model_safely()
+
+    if model is None:
+        # No trained weights available: benchmark a comparable stand-in network
+        print("Benchmarking a MobileNetV2 stand-in model")
+        model = tf.keras.applications.MobileNetV2(weights=None, input_shape=(224, 224, 3),
+                                                  classes=len(WASTE_CATEGORIES))
+        if config['model_mode'] == 'shared':
+            serving_path = f"sweep_standin_{os.getpid()}.tflite"
+            if not export_serving_model(model, serving_path):
+                sys.exit(1)
+            try:
+                model = SharedWeightsModel(serving_path, config['intra_op_threads'])
+            finally:
+                os.remove(serving_path)
+
+    for batch_size in args.batch_sizes:
+        batch = np.random.rand(batch_size, 224, 224, 3).astype(np.float32)
+        for _ in range(args.warmup):
+            model.predict(batch, verbose=0)
+
+    # Wait until every worker of this sweep point is loaded, so their measurements overlap
+    print(READY_MARKER, flush=True)
+    sys.stdin.readline()
+
+    results = []
+    for batch_size in args.batch_sizes:
+        batch = np.random.rand(batch_size, 224, 224, 3).astype(np.float32)
+        latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+
+        def serve():
+            # One request thread: back-to-back predictions, like a busy Flask thread
+            local = []
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                model.predict(batch, verbose=0)
+                local.append((time.perf_counter() - t0) * 1000)
+            with lock:
+                latencies.extend(local)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=serve) for _ in range(args.concurrency[0])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        results.append({
+            'batch_size': batch_size,
+            'images': len(latencies) * batch_size,
+            'elapsed': elapsed,
+            'latencies_ms': [round(latency, 3) for latency in latencies],
+        })
+
+    print(RESULT_MARKER + json.dumps({'config': config, 'results': results}))
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run_combination(args, intra, inter, onednn, workers, concurrency):
+    """Run one sweep point: `workers` processes measured at the same time. Returns aggregated rows"""
+    env = dict(os.environ)
+    env[runtime_config.INTRA_OP_THREADS_ENV] = str(intra)
+    env[runtime_config.INTER_OP_THREADS_ENV] = str(inter)
+    env[runtime_config.ONEDNN_ENV] = str(onednn)
+    env[runtime_config.MODEL_MODE_ENV] = args.model_mode
+    if args.cores:
+        env[runtime_config.CPU_CORES_ENV] = args.cores
+    if args.cores_per_worker:
+        env[runtime_config.CORES_PER_WORKER_ENV] = str(args.cores_per_worker)
+    env['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+    command = [sys.executable, os.path.abspath(__file__), '--worker',
+               '--batch-sizes', ','.join(str(b) for b in args.batch_sizes),
+               '--concurrency', str(concurrency),
+               '--duration', str(args.duration), '--warmup', str(args.warmup)]
+    label = f"intra={intra} inter={inter} oneDNN={onednn} workers={workers} concurrency={concurrency}"
+
+    procs = []
+    for index in range(workers):
+        worker_env = dict(env, **{runtime_config.WORKER_INDEX_ENV: str(index)})
+        procs.append(subprocess.Popen(command, env=worker_env, stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+    try:
+        for proc in procs:
+            for line in proc.stdout:
+                if line.strip() == READY_MARKER:
+                    break
+            else:
+                print(f"✗ {label} failed:")
+                print(proc.stderr.read()[-2000:])
+                return None
+        # Start every worker's measurement at once
+        for proc in procs:
+            proc.stdin.write('go\n')
+            proc.stdin.flush()
+
+        per_worker = []
+        for proc in procs:
+            stdout, stderr = proc.communicate()
+            result = next((json.loads(line[len(RESULT_MARKER):]) for line in stdout.splitlines()
+                           if line.startswith(RESULT_MARKER)), None)
+            if result is None:
+                print(f"✗ {label} failed:")
+                print(stderr[-2000:])
+                return None
+            per_worker.append(result['results'])
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    rows = []
+    for batch_index, batch_size in enumerate(args.batch_sizes):
+        entries = [results[batch_index] for results in per_worker]
+        latencies = sorted(latency for entry in entries for latency in entry['latencies_ms'])
+        rows.append({
+            'intra': intra, 'inter': inter, 'onednn': onednn,
+            'workers': workers, 'concurrency': concurrency, 'batch_size': batch_size,
+            # Workers ran side by side, so their rates add up
+            'throughput': round(sum(entry['images'] / entry['elapsed'] for entry in entries), 2),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+        })
+    return rows
+
+def recommend(rows, max_latency_ms):
+    """Pick the row with the highest total throughput whose p99 meets the latency budget.
+
+    `rows` must all share one batch size, otherwise larger batches win on
+    throughput and their per-batch p99 is compared against a per-request budget.
+    Concurrency is what makes this a trade-off: more workers or request
+    threads raise total throughput but queue requests behind each other.
+    """
+    within_budget = [row for row in rows if max_latency_ms is None or row['p99_ms'] <= max_latency_ms]
+    if not within_budget:
+        print(f"No setting meets p99 <= {max_latency_ms}ms; recommending the lowest-latency one")
+        return min(rows, key=lambda row: row['p99_ms'])
+    return max(within_budget, key=lambda row: (row['throughput'], -row['p99_ms']))
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep TensorFlow threading settings for SmartBin inference')
+    parser.add_argument('--intra', type=parse_int_list, default=[1, 2, 4, 8],
+                        help='intra-op thread counts to try (default: 1,2,4,8)')
+    parser.add_argument('--inter', type=parse_int_list, default=[1, 2],
+                        help='inter-op thread counts to try (default: 1,2)')
+    parser.add_argument('--onednn', type=parse_int_list, default=[0, 1],
+                        help='oneDNN settings to try, 0=off 1=on (default: 0,1)')
+    parser.add_argument('--batch-sizes', type=parse_int_list, default=[1, 8],
+                        help='batch sizes to benchmark (default: 1,8)')
+    parser.add_argument('--serving-batch-size', type=int, default=1,
+                        help='batch size the server actually runs; the recommendation is made for it '
+                             '(default: 1, as /predict and /stream classify one image at a time)')
+    parser.add_argument('--model-mode', choices=runtime_config.MODEL_MODES,
+                        default=runtime_config.get_runtime_config()['model_mode'],
+                        help=f"model loading mode to benchmark (default: ${runtime_config.MODEL_MODE_ENV} or keras)")
+    parser.add_argument('--workers', type=parse_int_list, default=[1],
+                        help='worker process counts to try, run simultaneously (default: 1)')
+    parser.add_argument('--concurrency', type=parse_int_list, default=[1, 4],
+                        help='concurrent requests per worker to try (default: 1,4)')
+    parser.add_argument('--cores', default=None,
+                        help='restrict every run to these cores, e.g. "0-15"')
+    parser.add_argument('--cores-per-worker', type=int, default=None,
+                        help='pin each worker to its own slice of this many cores')
+    parser.add_argument('--duration', type=float, default=10, help='seconds measured per batch size')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--max-latency-ms', type=float, default=None,
+                        help='p99 latency budget used when recommending a setting')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serving_batch_size not in args.batch_sizes:
+        args.batch_sizes.append(args.serving_batch_size)
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print("=" * 60)
+    print("SmartBin runtime sweep")
+    print(f"Model mode: {args.model_mode}")
+    print("=" * 60)
+
+    if args.cores:
+        available = runtime_config.parse_core_list(args.cores)
+    elif hasattr(os, 'sched_getaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+    rows = []
+    for intra, inter, onednn, workers, concurrency in itertools.product(
+            args.intra, args.inter, args.onednn, args.workers, args.concurrency):
+        if args.cores_per_worker and workers * args.cores_per_worker > len(available):
+            print(f"Skipping workers={workers}: needs {workers * args.cores_per_worker} cores, "
+                  f"{len(available)} available")
+            continue
+        print(f"Running intra={intra} inter={inter} oneDNN={onednn} workers={workers} concurrency={concurrency}...")
+        result = run_combination(args, intra, inter, onednn, workers, concurrency)
+        if result is not None:
+            rows.extend(result)
+
+    if not rows:
+        print("No sweep point completed")
+        sys.exit(1)
+
+    print(f"\n{'intra':>5} {'inter':>5} {'oneDNN':>6} {'wkrs':>4} {'conc':>4} {'batch':>5} "
+          f"{'img/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for row in rows:
+        print(f"{row['intra']:>5} {row['inter']:>5} {row['onednn']:>6} {row['workers']:>4} {row['concurrency']:>4} "
+              f"{row['batch_size']:>5} {row['throughput']:>9} {row['p50_ms']:>8} {row['p99_ms']:>8}")
+
+    serving_rows = [row for row in rows if row['batch_size'] == args.serving_batch_size]
+    if not serving_rows:
+        print(f"No results for the serving batch size {args.serving_batch_size}")
+        sys.exit(1)
+    best = recommend(serving_rows, args.max_latency_ms)
+    print(f"\nRecommended settings (for batch size {args.serving_batch_size}, "
+          f"the batch size the server runs; other batch sizes are shown for reference only):")
+    print(f"  {runtime_config.INTRA_OP_THREADS_ENV}={best['intra']}")
+    print(f"  {runtime_config.INTER_OP_THREADS_ENV}={best['inter']}")
+    print(f"  {runtime_config.ONEDNN_ENV}={best['onednn']}")
+    print(f"  {runtime_config.MODEL_MODE_ENV}={args.model_mode}")
+    if args.cores:
+        print(f"  {runtime_config.CPU_CORES_ENV}={args.cores}")
+    if args.cores_per_worker:
+        print(f"  {runtime_config.CORES_PER_WORKER_ENV}={args.cores_per_worker} "
+              f"(with {runtime_config.WORKER_INDEX_ENV}=0..{best['workers'] - 1})")
+    print(f"  with {best['workers']} worker process(es), each serving {best['concurrency']} request(s) at a time")
+    print(f"  (batch size {best['batch_size']}: {best['throughput']} img/s in total, "
+          f"p50 {best['p50_ms']}ms, p99 {best['p99_ms']}ms per request)")
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,25 @@
-import tensorflow as tf
+# TensorFlow is imported where it is used: shared mode serves without it
 from PIL import Image
 import numpy as np
 import io
 import os
+import sys
 import random
+import hashlib
+import threading
 from models import WASTE_CATEGORIES
 
+MODEL_PATH = 'smartbin_fixed.h5'
+# Serving artifact for the shared-weights mode, exported from MODEL_PATH
+SERVING_MODEL_PATH = 'smartbin_fixed.tflite'
+
+# Side length of the grayscale thumbnail used as a frame signature
+SIGNATURE_SIZE = 16
+
 # Load the model globally
 model = None
+# Content hashes of served model files, keyed by path
+_model_versions = {}
 
 def preprocess_image(image):
     """Preprocess image for model prediction"""
@@ -16,9 +28,30 @@ def preprocess_image(image):
     image = np.expand_dims(image, axis=0)
     return image
 
+def frame_signature(image, size=SIGNATURE_SIZE):
+    """Cheap perceptual signature of a frame: a tiny grayscale thumbnail scaled to 0-1"""
+    thumbnail = image.convert('L').resize((size, size), Image.BILINEAR)
+    return np.asarray(thumbnail, dtype=np.float32) / 255.0
+
+def decode_frame_signature(frame_bytes):
+    """Signature of an encoded frame without a full-resolution decode.
+
+    For JPEG, draft() makes the decoder produce grayscale at up to 1/8 scale,
+    so checking whether a frame changed costs a fraction of a full decode.
+    Other formats fall back to a normal decode.
+    """
+    frame = Image.open(io.BytesIO(frame_bytes))
+    frame.draft('L', (SIGNATURE_SIZE, SIGNATURE_SIZE))
+    return frame_signature(frame)
+
+def signature_distance(signature_a, signature_b):
+    """Mean absolute pixel difference between two frame signatures (0 = identical, 1 = inverted)"""
+    return float(np.mean(np.abs(signature_a - signature_b)))
+
 def fix_model_config():
     """Fix the model config by removing batch_shape if present"""
-    model_path = 'smartbin_fixed.h5'
+    import tensorflow as tf
+    model_path = MODEL_PATH
     try:
         with tf.io.gfile.GFile(model_path, 'rb') as f:
             model_config = tf.keras.models.load_model(f).get_config()
@@ -47,7 +80,8 @@ def fix_model_config():
 
 def load_model_safely():
     """Try to load the model with error handling"""
-    model_path = 'smartbin_fixed.h5'
+    import tensorflow as tf
+    model_path = MODEL_PATH
 
     if not os.path.exists(model_path):
         print(f"ERROR: Model file '{model_path}' not found!")
@@ -104,6 +138,216 @@ def load_model_safely():
     print("All loading methods failed. Running in demo mode with mock predictions")
     return None
 
+def _print_banner(*lines):
+    print("=" * 60)
+    for line in lines:
+        print(line)
+    print("=" * 60)
+
+def _load_tflite_runtime():
+    """Return (Interpreter, OpResolverType, runtime name), preferring a standalone TFLite runtime.
+
+    Importing TensorFlow costs every worker about 500 MB of private memory,
+    several times the model itself, so tf.lite is only the last resort.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter, OpResolverType
+        return Interpreter, OpResolverType, 'ai_edge_litert'
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter, OpResolverType
+        return Interpreter, OpResolverType, 'tflite_runtime'
+    except ImportError:
+        pass
+    _print_banner("WARNING: neither ai-edge-litert nor tflite-runtime is installed.",
+                  "Falling back to tf.lite, which loads all of TensorFlow into every worker",
+                  "and outweighs the memory saved by sharing the weights.",
+                  "Install one with `pip install ai-edge-litert`.")
+    import tensorflow as tf
+    return tf.lite.Interpreter, tf.lite.experimental.OpResolverType, 'tensorflow'
+
+class SharedWeightsModel:
+    """TFLite interpreter over a memory-mapped, read-only model file.
+
+    The weights are read straight from the mapped file, so every worker
+    process serving the same file shares one copy of them in the page cache
+    and only activations and interpreter state are private. Default delegates
+    (XNNPACK) are disabled because they repack the weights into private memory.
+    Exposes the subset of the Keras model interface the routes use.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        Interpreter, OpResolverType, self.runtime = _load_tflite_runtime()
+        self.model_path = model_path
+        self.interpreter = Interpreter(
+            model_path=model_path,
+            num_threads=num_threads,
+            experimental_op_resolver_type=OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        # The interpreter is not thread-safe and Flask serves requests on several threads
+        self._lock = threading.Lock()
+
+    @property
+    def output_shape(self):
+        return (None,) + tuple(int(d) for d in self.output_details['shape'][1:])
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=self.input_details['dtype'])
+        with self._lock:
+            if tuple(self.input_details['shape']) != batch.shape:
+                self.interpreter.resize_tensor_input(self.input_details['index'], batch.shape)
+                self.interpreter.allocate_tensors()
+                self.input_details = self.interpreter.get_input_details()[0]
+                self.output_details = self.interpreter.get_output_details()[0]
+            self.interpreter.set_tensor(self.input_details['index'], batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_details['index'])
+
+def export_serving_model(model, serving_path=SERVING_MODEL_PATH):
+    """Convert a loaded Keras model into the TFLite serving artifact"""
+    import tensorflow as tf
+    try:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        serving_model = converter.convert()
+        # Write then rename, so workers starting concurrently never map a half-written file
+        tmp_path = f"{serving_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(serving_model)
+        os.replace(tmp_path, serving_path)
+        print(f"✓ Exported serving model to {serving_path} ({len(serving_model) / 1e6:.1f} MB)")
+        return True
+    except Exception as e:
+        print(f"✗ Error exporting serving model: {str(e)}")
+        return False
+
+def load_model_shared(num_threads=None):
+    """Load the model in shared-weights mode from the serving artifact.
+
+    The artifact is expected to be exported ahead of time with
+    `python export_model.py`, so workers never load the Keras model.
+    """
+    if os.path.exists(SERVING_MODEL_PATH):
+        if os.path.exists(MODEL_PATH) and os.path.getmtime(SERVING_MODEL_PATH) < os.path.getmtime(MODEL_PATH):
+            _print_banner(f"WARNING: '{SERVING_MODEL_PATH}' is older than '{MODEL_PATH}'.",
+                          "Serving the existing export; run `python export_model.py` to refresh it.")
+    else:
+        # Last resort: each worker converting on its own keeps the Keras heap in its RSS
+        _print_banner(f"WARNING: serving model '{SERVING_MODEL_PATH}' not found.",
+                      f"Exporting from '{MODEL_PATH}' inside this worker. The Keras model's memory stays",
+                      "in this process, defeating shared-weights mode. Run `python export_model.py`",
+                      "once before starting the workers.")
+        import tensorflow as tf
+        keras_model = load_model_safely()
+        if keras_model is None or not export_serving_model(keras_model):
+            print("Could not prepare serving model. Running in demo mode with mock predictions")
+            return None
+        del keras_model
+        tf.keras.backend.clear_session()
+
+    try:
+        model = SharedWeightsModel(SERVING_MODEL_PATH, num_threads)
+        print(f"✓ Model memory-mapped from {SERVING_MODEL_PATH} (shared weights mode, {model.runtime})")
+        print(f"Model output shape: {model.output_shape}")
+        return model
+    except Exception as e:
+        print(f"✗ Shared weights load failed: {str(e)}")
+        print("Running in demo mode with mock predictions")
+        return None
+
+def get_model_version(model):
+    """Short content hash of the file the model was loaded from, used to tag logged predictions ('demo' without a model)"""
+    if model is None:
+        return 'demo'
+    # Shared-weights models are served from the exported file, not MODEL_PATH
+    model_path = getattr(model, 'model_path', MODEL_PATH)
+    if model_path not in _model_versions:
+        digest = hashlib.sha1()
+        try:
+            with open(model_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            _model_versions[model_path] = digest.hexdigest()[:8]
+        except OSError:
+            _model_versions[model_path] = 'unknown'
+    return _model_versions[model_path]
+
+def get_tensorflow_version():
+    """TensorFlow version if this process has loaded it (shared mode serves without it), else None"""
+    tf = sys.modules.get('tensorflow')
+    return getattr(tf, '__version__', None)
+
+def classify_image(model, processed_image, filename):
+    """Run the model (or demo mode) on a preprocessed image and return category predictions"""
+    # Check if we have a real model or using demo mode
+    if model is None:
+        print("Using demo mode for prediction")
+        predictions_data = generate_mock_predictions(filename)
+    else:
+        try:
+            # Make prediction with the model
+            model_predictions = model.predict(processed_image, verbose=0)
+
+            # Convert model predictions to our format
+            predictions_data = []
+
+            # Assuming model outputs probabilities for each class
+            if len(model_predictions.shape) == 2 and model_predictions.shape[1] >= len(WASTE_CATEGORIES):
+                # Model has multiple outputs (one per class)
+                for i in range(min(len(WASTE_CATEGORIES), model_predictions.shape[1])):
+                    prob = float(model_predictions[0][i]) * 100
+                    if prob > 1:  # Only include predictions with significant probability
+                        category = WASTE_CATEGORIES[i]
+                        predictions_data.append({
+                            'id': category['id'],
+                            'name': category['name'],
+                            'type': category['type'],
+                            'probability': round(prob, 2),
+                            'color': category['color'],
+                            'icon': category['icon']
+                        })
+            elif len(model_predictions.shape) == 2 and model_predictions.shape[1] == 2:
+                # Binary classification output
+                prob_bio = float(model_predictions[0][1]) * 100
+                prob_non_bio = float(model_predictions[0][0]) * 100
+
+                # Distribute probabilities among categories based on type
+                bio_categories = [cat for cat in WASTE_CATEGORIES if cat['type'] == 'Biodegradable']
+                non_bio_categories = [cat for cat in WASTE_CATEGORIES if cat['type'] == 'Non-Biodegradable']
+
+                # For demo, assign probabilities to top categories
+                predictions_data = [
+                    {
+                        'id': bio_categories[0]['id'] if bio_categories else 5,
+                        'name': bio_categories[0]['name'] if bio_categories else 'Organic/Food',
+                        'type': 'Biodegradable',
+                        'probability': round(prob_bio, 2),
+                        'color': '#2ecc71',
+                        'icon': 'fas fa-leaf'
+                    },
+                    {
+                        'id': non_bio_categories[0]['id'] if non_bio_categories else 0,
+                        'name': non_bio_categories[0]['name'] if non_bio_categories else 'Plastic',
+                        'type': 'Non-Biodegradable',
+                        'probability': round(prob_non_bio, 2),
+                        'color': '#e74c3c',
+                        'icon': 'fas fa-trash-alt'
+                    }
+                ]
+            else:
+                # Fallback to mock predictions
+                predictions_data = generate_mock_predictions(filename)
+
+        except Exception as e:
+            print(f"Model prediction error: {str(e)}")
+            predictions_data = generate_mock_predictions(filename)
+
+    # Sort predictions by probability (highest first)
+    predictions_data.sort(key=lambda x: x['probability'], reverse=True)
+    return predictions_data
+
 def generate_mock_predictions(filename):
     """Generate realistic mock predictions based on filename"""
     filename_lower = filename.lower()